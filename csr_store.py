@@ -0,0 +1,100 @@
+import json
+import os
+import pickle
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+# Файлы с границами строк и индексом ключ -> строка в CSR-раскладке
+OFFSETS_FILE = "offsets.npy"
+INDEX_FILE = "index.pkl"
+META_FILE = "meta.json"
+
+
+def write_csr(df: pd.DataFrame, key: str, columns: List[str], path: str) -> None:
+    """
+    Сохраняет таблицу в CSR-раскладке: индекс ключей, массивы границ строк и значений в формате .npy.
+
+    Строки упорядочиваются по ключу, порядок строк внутри одного ключа сохраняется.
+    Колонки со значениями сохраняются в исходном типе данных.
+
+    Args:
+        df: Исходная таблица
+        key: Колонка с ключом поиска
+        columns: Колонки со значениями
+        path: Директория для сохранения файлов
+
+    Raises:
+        ValueError: Если колонка со значениями не числовая или содержит пропуски
+    """
+    for column in columns:
+        dtype = df[column].dtype
+        if not isinstance(dtype, np.dtype) or dtype.kind not in "iuf":
+            raise ValueError(f"Column {column} must have a numeric numpy dtype, got {dtype}")
+        if df[column].hasnans:
+            raise ValueError(f"Column {column} contains missing values")
+
+    os.makedirs(path, exist_ok=True)
+    df = df.sort_values(key, kind="stable")
+    keys, counts = np.unique(df[key].to_numpy(dtype=np.int64), return_counts=True)
+    offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    np.save(os.path.join(path, OFFSETS_FILE), offsets)
+    with open(os.path.join(path, INDEX_FILE), "wb") as f:
+        pickle.dump({key_value: i for i, key_value in enumerate(keys.tolist())}, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    for column in columns:
+        np.save(os.path.join(path, f"{column}.npy"), df[column].to_numpy())
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump({"columns": columns}, f)
+
+
+class CSRStore:
+    """
+    Хранилище для поиска по ключу поверх файлов в CSR-раскладке.
+    Файлы отображаются в память, поэтому страницы с данными разделяются между процессами.
+    """
+    def __init__(self):
+        self._index = {}
+        self._offsets = None
+        self._columns = {}
+
+    def load(self, path: str) -> None:
+        """
+        Отображает в память файлы, сохранённые write_csr.
+
+        Args:
+            path: Директория с файлами
+        """
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        with open(os.path.join(path, INDEX_FILE), "rb") as f:
+            self._index = pickle.load(f)
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self._columns = {
+            column: np.load(os.path.join(path, f"{column}.npy"), mmap_mode="r")
+            for column in meta["columns"]
+        }
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get(self, key: int, k: int) -> Optional[Dict[str, List[Any]]]:
+        """
+        Получает первые k значений для ключа.
+
+        Args:
+            key: Ключ поиска
+            k: Количество значений
+
+        Returns:
+            Словарь со списками значений по колонкам или None, если ключ не найден
+        """
+        i = self._index.get(key)
+        if i is None:
+            return None
+        lo = int(self._offsets[i])
+        hi = min(int(self._offsets[i + 1]), lo + k)
+        return {column: values[lo:hi].tolist() for column, values in self._columns.items()}
@@ -2,8 +2,10 @@ import logging
 from typing import Dict, List, Any, Optional
 from contextlib import asynccontextmanager
 
-import pandas as pd
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Body, Depends, FastAPI, HTTPException, status
+from fastapi.responses import ORJSONResponse
+
+from csr_store import CSRStore
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -14,24 +16,21 @@ class SimilarItems:
     """
     def __init__(self):
         self._similar_items = None
-        self._stats = {
-            "request_count": 0,
-            "not_found_count": 0
-        }
+        self._request_count = 0
+        self._not_found_count = 0
 
-    def load(self, path: str, **kwargs) -> None:
+    def load(self, path: str) -> None:
         """
-        Загружает данные о похожих элементах из parquet файла.
+        Загружает данные о похожих элементах из CSR-файлов .npy (см. prepare_data.py).
         
         Args:
-            path: Путь к файлу с похожими элементами
-            **kwargs: Дополнительные параметры для pd.read_parquet
+            path: Путь к директории с похожими элементами
         """
         logger.info(f"Loading similar items data from {path}")
         try:
-            self._similar_items = pd.read_parquet(path, **kwargs)
-            self._similar_items = self._similar_items.set_index('item_id_1')
-            logger.info(f"Successfully loaded similar items data, shape: {self._similar_items.shape}")
+            self._similar_items = CSRStore()
+            self._similar_items.load(path)
+            logger.info(f"Successfully loaded similar items data, items: {len(self._similar_items)}")
         except Exception as e:
             logger.error(f"Failed to load similar items data: {str(e)}")
             raise
@@ -47,32 +46,55 @@ class SimilarItems:
         Returns:
             Словарь с ключами 'item_id_2' и 'track_seq', содержащими списки ID и коэффициенты похожести
         """
-        self._stats["request_count"] += 1
+        self._request_count += 1
         
         try:
-            similar_items = self._similar_items.loc[item_id]
-            result = similar_items[["item_id_2", "track_seq"]].head(k).to_dict(orient="list")
-            logger.info(f"Found {len(result['item_id_2'])} similar items for item_id: {item_id}")
+            result = self._similar_items.get(item_id, k)
+            if result is None:
+                logger.debug("No similar items found for item_id: %s", item_id)
+                self._not_found_count += 1
+                return {"item_id_2": [], "track_seq": []}
+            logger.debug("Found %d similar items for item_id: %s", len(result["item_id_2"]), item_id)
             return result
-        except KeyError:
-            logger.warning(f"No similar items found for item_id: {item_id}")
-            self._stats["not_found_count"] += 1
-            return {"item_id_2": [], "track_seq": []}
         except Exception as e:
             logger.error(f"Error getting similar items for item_id {item_id}: {str(e)}")
             return {"item_id_2": [], "track_seq": []}
 
+    def get_batch(self, item_ids: List[int], k: int = 10) -> Dict[str, List[List[Any]]]:
+        """
+        Получает списки похожих элементов сразу для нескольких item_id.
+        
+        Args:
+            item_ids: Список ID элементов
+            k: Количество похожих элементов для каждого элемента
+            
+        Returns:
+            Словарь с ключами 'item_id_2' и 'track_seq', содержащими по одному списку
+            на каждый item_id в порядке запроса
+        """
+        results = [self.get(item_id, k) for item_id in item_ids]
+        return {
+            "item_id_2": [result["item_id_2"] for result in results],
+            "track_seq": [result["track_seq"] for result in results],
+        }
+
     def stats(self) -> None:
         """
         Выводит статистику использования в лог.
         """
         logger.info("Stats for similar items")
-        for name, value in self._stats.items():
-            logger.info(f"{name:<30} {value}")
+        logger.info(f"{'request_count':<30} {self._request_count}")
+        logger.info(f"{'not_found_count':<30} {self._not_found_count}")
 
 # Создаем экземпляр класса
 sim_items_store = SimilarItems()
 
+async def get_sim_items() -> SimilarItems:
+    """
+    Зависимость FastAPI, возвращающая хранилище похожих элементов.
+    """
+    return sim_items_store
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -85,8 +107,7 @@ async def lifespan(app: FastAPI):
     try:
         # Код ниже (до yield) выполнится только один раз при запуске сервиса
         sim_items_store.load(
-            "recsys/recommendations/similar.parquet",  # путь к файлу с похожими элементами
-            columns=["item_id_1", "item_id_2", "track_seq"],
+            "recsys/recommendations/similar",  # путь к директории с похожими элементами
         )
         app.state.sim_items = sim_items_store
         logger.info("Features service initialized successfully and ready to serve requests!")
@@ -104,11 +125,16 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title="Features Service",
     description="API для получения похожих элементов",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-@app.post("/similar_items", response_model=Dict[str, List[Any]])
-async def similar_items(item_id: int, k: int = 10) -> Dict[str, List[Any]]:
+@app.post("/similar_items", response_model=None)
+async def similar_items(
+    item_id: int,
+    k: int = 10,
+    store: SimilarItems = Depends(get_sim_items)
+) -> ORJSONResponse:
     """
     Получает список похожих элементов для данного item_id.
     
@@ -117,13 +143,42 @@ async def similar_items(item_id: int, k: int = 10) -> Dict[str, List[Any]]:
         k: Количество похожих элементов для возврата
         
     Returns:
-        Словарь с ключами 'item_id_2' и 'track_seq', содержащими списки ID и коэффициенты похожести
+        Ответ с ключами 'item_id_2' и 'track_seq', содержащими списки ID и коэффициенты похожести
+    """
+    logger.debug("Received request for similar items, item_id: %s, k: %s", item_id, k)
+    
+    try:
+        similar_items = store.get(item_id, k)
+        return ORJSONResponse(similar_items)
+    except Exception as e:
+        logger.error(f"Error processing request: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error retrieving similar items"
+        )
+
+@app.post("/similar_items_batch", response_model=None)
+async def similar_items_batch(
+    item_ids: List[int] = Body(...),
+    k: int = Body(10),
+    store: SimilarItems = Depends(get_sim_items)
+) -> ORJSONResponse:
+    """
+    Получает списки похожих элементов сразу для нескольких item_id.
+    
+    Args:
+        item_ids: Список ID элементов
+        k: Количество похожих элементов для каждого элемента
+        
+    Returns:
+        Ответ с ключами 'item_id_2' и 'track_seq', содержащими по одному списку
+        на каждый item_id в порядке запроса
     """
-    logger.info(f"Received request for similar items, item_id: {item_id}, k: {k}")
+    logger.debug("Received batch request for similar items, item_ids: %s, k: %s", item_ids, k)
     
     try:
-        similar_items = app.state.sim_items.get(item_id, k)
-        return similar_items
+        similar_items = store.get_batch(item_ids, k)
+        return ORJSONResponse(similar_items)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         raise HTTPException(
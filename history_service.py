@@ -2,8 +2,10 @@ import logging
 from typing import Dict, List, Any, Optional
 from contextlib import asynccontextmanager
 
-import pandas as pd
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.responses import ORJSONResponse
+
+from csr_store import CSRStore
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -14,24 +16,21 @@ class History:
     """
     def __init__(self):
         self._history = None
-        self._stats = {
-            "request_count": 0,
-            "not_found_count": 0
-        }
+        self._request_count = 0
+        self._not_found_count = 0
 
-    def load(self, path: str, **kwargs) -> None:
+    def load(self, path: str) -> None:
         """
-        Загружает данные истории из parquet файла.
+        Загружает данные истории из CSR-файлов .npy (см. prepare_data.py).
         
         Args:
-            path: Путь к файлу с историей
-            **kwargs: Дополнительные параметры для pd.read_parquet
+            path: Путь к директории с историей
         """
         logger.info(f"Loading user history data from {path}")
         try:
-            self._history = pd.read_parquet(path, **kwargs)
-            self._history = self._history.set_index('user_id')
-            logger.info(f"Successfully loaded user history data, shape: {self._history.shape}")
+            self._history = CSRStore()
+            self._history.load(path)
+            logger.info(f"Successfully loaded user history data, users: {len(self._history)}")
         except Exception as e:
             logger.error(f"Failed to load user history data: {str(e)}")
             raise
@@ -47,17 +46,16 @@ class History:
         Returns:
             Словарь с ключами 'track_id' и 'track_seq', содержащими списки ID треков и их последовательности
         """
-        self._stats["request_count"] += 1
+        self._request_count += 1
         
         try:
-            history = self._history.loc[user_id]
-            result = history[["track_id", "track_seq"]].head(k).to_dict(orient="list")
-            logger.info(f"Found {len(result['track_id'])} history items for user_id: {user_id}")
+            result = self._history.get(user_id, k)
+            if result is None:
+                logger.debug("No history found for user_id: %s", user_id)
+                self._not_found_count += 1
+                return {"track_id": [], "track_seq": []}
+            logger.debug("Found %d history items for user_id: %s", len(result["track_id"]), user_id)
             return result
-        except KeyError:
-            logger.warning(f"No history found for user_id: {user_id}")
-            self._stats["not_found_count"] += 1
-            return {"track_id": [], "track_seq": []}
         except Exception as e:
             logger.error(f"Error getting history for user_id {user_id}: {str(e)}")
             return {"track_id": [], "track_seq": []}
@@ -67,12 +65,18 @@ class History:
         Выводит статистику использования в лог.
         """
         logger.info("Stats for user history")
-        for name, value in self._stats.items():
-            logger.info(f"{name:<30} {value}")
+        logger.info(f"{'request_count':<30} {self._request_count}")
+        logger.info(f"{'not_found_count':<30} {self._not_found_count}")
 
 # Создаем экземпляр класса
 history_store = History()
 
+async def get_history_store() -> History:
+    """
+    Зависимость FastAPI, возвращающая хранилище истории пользователей.
+    """
+    return history_store
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -85,8 +89,7 @@ async def lifespan(app: FastAPI):
     try:
         # Код выполнится один раз при запуске сервиса
         history_store.load(
-            "recsys/recommendations/personal_als.parquet",
-            columns=["user_id", "track_id", "track_seq"],
+            "recsys/recommendations/history",
         )
         app.state.history = history_store
         logger.info("History service initialized successfully and ready to serve requests!")
@@ -105,11 +108,16 @@ app = FastAPI(
     title="History Service",
     description="API для получения истории прослушивания пользователей",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-@app.post("/get", response_model=Dict[str, List[Any]])
-async def get_history(user_id: int, k: int = 3) -> Dict[str, List[Any]]:
+@app.post("/get", response_model=None)
+async def get_history(
+    user_id: int,
+    k: int = 3,
+    store: History = Depends(get_history_store)
+) -> ORJSONResponse:
     """
     Получает историю прослушивания для пользователя.
     
@@ -118,13 +126,13 @@ async def get_history(user_id: int, k: int = 3) -> Dict[str, List[Any]]:
         k: Количество последних треков для возврата
         
     Returns:
-        Словарь с ключами 'track_id' и 'track_seq', содержащими списки ID треков и их последовательности
+        Ответ с ключами 'track_id' и 'track_seq', содержащими списки ID треков и их последовательности
     """
-    logger.info(f"Received request for user history, user_id: {user_id}, k: {k}")
+    logger.debug("Received request for user history, user_id: %s, k: %s", user_id, k)
     
     try:
-        history = app.state.history.get(user_id, k)
-        return history
+        history = store.get(user_id, k)
+        return ORJSONResponse(history)
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,34 @@
+import logging
+
+import pyarrow.parquet as pq
+
+from csr_store import write_csr
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "recsys/recommendations"
+
+# Исходный parquet файл, ключ, колонки со значениями и директория для CSR-файлов
+DATASETS = [
+    (f"{DATA_DIR}/similar.parquet", "item_id_1", ["item_id_2", "track_seq"], f"{DATA_DIR}/similar"),
+    (f"{DATA_DIR}/personal_als.parquet", "user_id", ["track_id", "track_seq"], f"{DATA_DIR}/history"),
+    (f"{DATA_DIR}/recommendations.parquet", "user_id", ["track_id", "track_seq"], f"{DATA_DIR}/personal"),
+]
+
+
+def main() -> None:
+    """
+    Преобразует parquet файлы с данными сервисов в CSR-файлы .npy для отображения в память.
+    Запускается один раз перед стартом сервисов.
+    """
+    for source, key, columns, target in DATASETS:
+        logger.info(f"Converting {source} -> {target}")
+        # split_blocks/self_destruct избавляют от копирования данных при конвертации в pandas
+        df = pq.read_table(source, columns=[key] + columns).to_pandas(split_blocks=True, self_destruct=True)
+        write_csr(df, key, columns, target)
+        logger.info(f"Saved {len(df)} rows to {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,49 +1,76 @@
+import heapq
 import logging
 from typing import List, Dict, Any, Tuple, Optional
 from contextlib import asynccontextmanager
 
-import requests
+import orjson
 import pandas as pd
-from fastapi import FastAPI, HTTPException, status
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.responses import ORJSONResponse, Response
 
-logger = logging.getLogger("uvicorn.error")
-
-# Конфигурация URL внешних сервисов
-FEATURES_STORE_URL = "http://127.0.0.1:8010"
-HISTORY_STORE_URL = "http://127.0.0.1:8020"
+from csr_store import CSRStore
+from features_service import SimilarItems, get_sim_items, sim_items_store
+from history_service import History, get_history_store, history_store
 
-# Стандартные заголовки для HTTP-запросов
-DEFAULT_HEADERS = {"Content-type": "application/json", "Accept": "text/plain"}
+logger = logging.getLogger("uvicorn.error")
 
+# Значения k, для которых ответ с дефолтными рекомендациями сериализуется заранее
+DEFAULT_RECS_K = (10, 50, 100)
 
 class Recommendations:
     def __init__(self):
         self._recs = {}
-        self._stats = {
-            "request_personal_count": 0,
-            "request_default_count": 0
-            
-        }
+        self._default_json = {}
+        self._request_personal_count = 0
+        self._request_default_count = 0
 
     def load(self, rec_type: str, path: str, **kwargs) -> None:
         """
-        Загружает рекомендации из parquet файла.
+        Загружает рекомендации: персональные из CSR-файлов .npy (см. prepare_data.py),
+        дефолтные из parquet файла.
         
         Args:
             rec_type: Тип рекомендаций ('personal' или 'default')
-            path: Путь к файлу с рекомендациями
+            path: Путь к директории или файлу с рекомендациями
             **kwargs: Дополнительные параметры для pd.read_parquet
         """
         logger.info(f"Loading data, type: {rec_type}")
         try:
-            self._recs[rec_type] = pd.read_parquet(path, **kwargs)
             if rec_type == "personal":
-                self._recs[rec_type] = self._recs[rec_type].set_index("user_id")
+                self._recs[rec_type] = CSRStore()
+                self._recs[rec_type].load(path)
+            else:
+                recs = pd.read_parquet(path, **kwargs)
+                self._recs[rec_type] = recs["track_id"].tolist()
+                # Дефолтные рекомендации одинаковы для всех, поэтому готовые ответы сериализуем один раз
+                self._default_json = {
+                    k: orjson.dumps({"recs": self._recs[rec_type][:k]}) for k in DEFAULT_RECS_K
+                }
             logger.info(f"Successfully loaded {rec_type} recommendations")
         except Exception as e:
             logger.error(f"Failed to load {rec_type} recommendations: {str(e)}")
             raise
 
+    def _get_personal(self, user_id: int, k: int) -> Optional[List[int]]:
+        """
+        Получает персональные рекомендации и учитывает запрос в статистике.
+        
+        Args:
+            user_id: ID пользователя
+            k: Количество рекомендаций
+            
+        Returns:
+            Список ID треков или None, если нужно использовать дефолтные рекомендации
+        """
+        recs = self._recs["personal"].get(user_id, k)
+        if recs is not None:
+            self._request_personal_count += 1
+            logger.debug("Retrieved personal recommendations for user_id: %s", user_id)
+            return recs["track_id"]
+        logger.debug("No personal recommendations found for user_id: %s, using default", user_id)
+        self._request_default_count += 1
+        return None
+
     def get(self, user_id: int, k: int = 100) -> List[int]:
         """
         Получает рекомендации для пользователя.
@@ -56,29 +83,47 @@ class Recommendations:
             Список ID треков для рекомендации
         """
         try:
-            recs = self._recs["personal"].loc[user_id]
-            recs = recs["track_id"].to_list()[:k]
-            self._stats["request_personal_count"] += 1
-            logger.info(f"Retrieved personal recommendations for user_id: {user_id}")
-            
-        except KeyError:
-            logger.info(f"No personal recommendations found for user_id: {user_id}, using default")
-            recs = self._recs["default"]
-            recs = recs["track_id"].to_list()[:k]
-            self._stats["request_default_count"] += 1
+            recs = self._get_personal(user_id, k)
+            if recs is None:
+                recs = self._recs["default"][:k]
         except Exception as e: 
             logger.error(f"Unknown error retrieving recommendations: {str(e)}")
             # Возвращаем пустой список в случае ошибки
             recs = []
         return recs
 
+    def get_json(self, user_id: int, k: int = 100) -> bytes:
+        """
+        Получает рекомендации для пользователя в виде готового JSON-ответа.
+        Для дефолтных рекомендаций с k из DEFAULT_RECS_K возвращается заранее сериализованный ответ.
+        
+        Args:
+            user_id: ID пользователя
+            k: Количество рекомендаций
+            
+        Returns:
+            JSON-ответ {"recs": [...]}
+        """
+        try:
+            recs = self._get_personal(user_id, k)
+            if recs is None:
+                body = self._default_json.get(k)
+                if body is not None:
+                    return body
+                recs = self._recs["default"][:k]
+        except Exception as e: 
+            logger.error(f"Unknown error retrieving recommendations: {str(e)}")
+            # Возвращаем пустой список в случае ошибки
+            recs = []
+        return orjson.dumps({"recs": recs})
+
     def stats(self) -> None:
         """
         Выводит статистику использования рекомендаций в лог.
         """
         logger.info("Stats for recommendations")
-        for name, value in self._stats.items():
-            logger.info(f"{name:<30} {value}")
+        logger.info(f"{'request_personal_count':<30} {self._request_personal_count}")
+        logger.info(f"{'request_default_count':<30} {self._request_default_count}")
             
 def dedup_ids(ids: List[int]) -> List[int]:
     """
@@ -90,13 +135,16 @@ def dedup_ids(ids: List[int]) -> List[int]:
     Returns:
         Список уникальных ID с сохранением порядка первого появления
     """
-    seen = set()
-    result = []
-    for id in ids:
-        if id not in seen:
-            seen.add(id)
-            result.append(id)
-    return result
+    return list(dict.fromkeys(ids))
+
+# Создаем экземпляр класса
+rec_store = Recommendations()
+
+async def get_rec_store() -> Recommendations:
+    """
+    Зависимость FastAPI, возвращающая хранилище рекомендаций.
+    """
+    return rec_store
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -108,17 +156,24 @@ async def lifespan(app: FastAPI):
     """
     logger.info("Starting recommendations service")
     try:
-        rec_store = Recommendations()
+        # История и похожие элементы загружаются в этот же процесс и используются напрямую, без HTTP
+        history_store.load(
+            "recsys/recommendations/history",  # путь к директории с историей пользователей
+        )
+        sim_items_store.load(
+            "recsys/recommendations/similar",  # путь к директории с похожими элементами
+        )
         rec_store.load(
             "personal",
-            "recsys/recommendations/recommendations.parquet",  # путь к файлу с персональными рекомендациями
-            columns=["user_id", "track_id", "track_seq"],
+            "recsys/recommendations/personal",  # путь к директории с персональными рекомендациями
         )
         rec_store.load(
             "default",
             "recsys/recommendations/top_popular.parquet",  # путь к файлу с дефолтными рекомендациями
             columns=["track_id", "track_seq"],
         )
+        app.state.history = history_store
+        app.state.sim_items = sim_items_store
         app.state.recs = rec_store
         logger.info("Recommendations service initialized successfully")
     except Exception as e:
@@ -128,110 +183,142 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Stopping recommendations service")
+    app.state.history.stats()
+    app.state.sim_items.stats()
     app.state.recs.stats()
 
 # Создаём приложение FastAPI
 app = FastAPI(
     title="Recommendations Service",
     description="API для получения рекомендаций музыкальных треков",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-@app.post("/recommendations_offline", response_model=Dict[str, List[int]])
-async def recommendations_offline(user_id: int, k: int = 100) -> Dict[str, List[int]]:
+def get_offline_recs(store: Recommendations, user_id: int, k: int) -> Dict[str, List[int]]:
     """
     Получает офлайн рекомендации для пользователя.
     
     Args:
+        store: Хранилище рекомендаций
         user_id: ID пользователя
         k: Количество рекомендаций
         
     Returns:
         Словарь с ключом 'recs' и списком ID треков для рекомендации
     """
-    logger.info(f"Getting offline recommendations for user_id: {user_id}, k: {k}")
-    recs = app.state.recs.get(user_id, k)
+    logger.debug("Getting offline recommendations for user_id: %s, k: %s", user_id, k)
+    recs = store.get(user_id, k)
     return {"recs": recs}
 
-def dedup_ids(ids):
+@app.post("/recommendations_offline", response_model=None)
+async def recommendations_offline(
+    user_id: int,
+    k: int = 100,
+    store: Recommendations = Depends(get_rec_store)
+) -> Response:
+    """
+    Получает офлайн рекомендации для пользователя.
+    
+    Args:
+        user_id: ID пользователя
+        k: Количество рекомендаций
+        
+    Returns:
+        Ответ с ключом 'recs' и списком ID треков для рекомендации
+    """
+    logger.debug("Getting offline recommendations for user_id: %s, k: %s", user_id, k)
+    return Response(content=store.get_json(user_id, k), media_type="application/json")
+
+def merge_similar_items(similar_items: Dict[str, List[List[Any]]], k: int) -> List[int]:
+    """
+    Сливает списки похожих треков в k уникальных рекомендаций по убыванию похожести.
+    
+    Списки похожих треков уже отсортированы по убыванию похожести,
+    поэтому сливаем их и останавливаемся, набрав k уникальных треков.
+    
+    Args:
+        similar_items: Результат SimilarItems.get_batch с одним списком 'item_id_2' и 'track_seq' на каждый трек
+        k: Количество рекомендаций
+        
+    Returns:
+        Список ID треков для рекомендации
+    """
+    per_track_lists = [
+        zip(item_ids, track_seq)
+        for item_ids, track_seq in zip(similar_items.get("item_id_2", []), similar_items.get("track_seq", []))
+    ]
     seen = set()
-    ids = [id for id in ids if not (id in seen or seen.add(id))]
-    return ids
+    recs = []
+    for item_id, _ in heapq.merge(*per_track_lists, key=lambda x: x[1], reverse=True):
+        if item_id not in seen:
+            seen.add(item_id)
+            recs.append(item_id)
+            if len(recs) == k:
+                break
+    return recs
 
-@app.post("/recommendations_online", response_model=Dict[str, List[int]])
-async def recommendations_online(user_id: int, k: int = 100) -> Dict[str, List[int]]:
+def get_online_recs(history: History, sim_items: SimilarItems, user_id: int, k: int) -> Dict[str, List[int]]:
     """
     Получает онлайн рекомендации для пользователя на основе его истории.
     
     Args:
+        history: Хранилище истории пользователей
+        sim_items: Хранилище похожих элементов
         user_id: ID пользователя
         k: Количество рекомендаций
         
     Returns:
         Словарь с ключом 'recs' и списком ID треков для рекомендации
     """
-    logger.info(f"Getting online recommendations for user_id: {user_id}, k: {k}")
+    logger.debug("Getting online recommendations for user_id: %s, k: %s", user_id, k)
     
     try:
         # Получаем историю пользователя
-        params = {"user_id": user_id, "k": 3}
-        resp = requests.post(
-            f"{HISTORY_STORE_URL}/get", 
-            headers=DEFAULT_HEADERS, 
-            params=params
-        )
-        
-        if resp.status_code != 200:
-            logger.warning(f"Failed to get user history: status code {resp.status_code}")
-            return {"recs": []}
-        
-        events = resp.json()
-        events = events.get("track_id", [])
+        events = history.get(user_id, 3)["track_id"]
         
         if not events:
-            logger.info(f"No history found for user_id: {user_id}")
+            logger.debug("No history found for user_id: %s", user_id)
             return {"recs": []}
         
-        # Получаем похожие треки для каждого трека в истории
-        items = []
-        scores = []
-        for track_id in events:
-            similar_items_params = {"item_id": track_id, "k": k}
-            
-            try:
-                similar_items_resp = requests.post(
-                    f"{FEATURES_STORE_URL}/similar_items", 
-                    headers=DEFAULT_HEADERS, 
-                    params=similar_items_params
-                )
-                
-                if similar_items_resp.status_code != 200:
-                    logger.warning(f"Failed to get similar items for track_id {track_id}: status code {similar_items_resp.status_code}")
-                    continue
-                
-                item_similar_items = similar_items_resp.json()
-                items.extend(item_similar_items.get("item_id_2", []))
-                scores.extend(item_similar_items.get("track_seq", []))
-                
-            except Exception as e:
-                logger.error(f"Error getting similar items for track_id {track_id}: {str(e)}")
-                continue
+        # Получаем похожие треки для всех треков из истории
+        similar_items = sim_items.get_batch(events, k)
+        recs = merge_similar_items(similar_items, k)
         
-        # Сортируем и дедуплицируем рекомендации
-        combined = list(zip(items, scores))
-        combined = sorted(combined, key=lambda x: x[1], reverse=True)
-        combined = [item for item, _ in combined]
-        recs = dedup_ids(combined)
-        
-        logger.info(f"Generated {len(recs)} online recommendations for user_id: {user_id}")
+        logger.debug("Generated %d online recommendations for user_id: %s", len(recs), user_id)
         return {"recs": recs}
         
     except Exception as e:
         logger.error(f"Error generating online recommendations: {str(e)}")
         return {"recs": []}
 
-@app.post("/recommendations", response_model=Dict[str, List[int]])
-async def recommendations(user_id: int, k: int = 100) -> Dict[str, List[int]]:
+@app.post("/recommendations_online", response_model=None)
+async def recommendations_online(
+    user_id: int,
+    k: int = 100,
+    history: History = Depends(get_history_store),
+    sim_items: SimilarItems = Depends(get_sim_items)
+) -> ORJSONResponse:
+    """
+    Получает онлайн рекомендации для пользователя на основе его истории.
+    
+    Args:
+        user_id: ID пользователя
+        k: Количество рекомендаций
+        
+    Returns:
+        Ответ с ключом 'recs' и списком ID треков для рекомендации
+    """
+    return ORJSONResponse(get_online_recs(history, sim_items, user_id, k))
+
+@app.post("/recommendations", response_model=None)
+async def recommendations(
+    user_id: int,
+    k: int = 100,
+    store: Recommendations = Depends(get_rec_store),
+    history: History = Depends(get_history_store),
+    sim_items: SimilarItems = Depends(get_sim_items)
+) -> ORJSONResponse:
     """
     Получает смешанные рекомендации (офлайн + онлайн) для пользователя.
     
@@ -246,14 +333,14 @@ async def recommendations(user_id: int, k: int = 100) -> Dict[str, List[int]]:
         k: Количество рекомендаций
         
     Returns:
-        Словарь с ключом 'recs' и списком ID треков для рекомендации
+        Ответ с ключом 'recs' и списком ID треков для рекомендации
     """
-    logger.info(f"Getting blended recommendations for user_id: {user_id}, k: {k}")
+    logger.debug("Getting blended recommendations for user_id: %s, k: %s", user_id, k)
     
     try:
         # Получаем офлайн и онлайн рекомендации
-        recs_offline = await recommendations_offline(user_id, k)
-        recs_online = await recommendations_online(user_id, k)
+        recs_offline = get_offline_recs(store, user_id, k)
+        recs_online = get_online_recs(history, sim_items, user_id, k)
 
         # Проверка формата данных
         if not isinstance(recs_offline.get("recs", []), list):
@@ -287,10 +374,10 @@ async def recommendations(user_id: int, k: int = 100) -> Dict[str, List[int]]:
         recs_blended = dedup_ids(recs_blended)
         recs_blended = recs_blended[:k]
         
-        logger.info(f"Generated {len(recs_blended)} blended recommendations for user_id: {user_id}")
-        return {"recs": recs_blended}
+        logger.debug("Generated %d blended recommendations for user_id: %s", len(recs_blended), user_id)
+        return ORJSONResponse({"recs": recs_blended})
         
     except Exception as e:
         logger.error(f"Error generating blended recommendations: {str(e)}")
         # В случае ошибки возвращаем пустой список рекомендаций
-        return {"recs": []}
\ No newline at end of file
+        return ORJSONResponse({"recs": []})
\ No newline at end of file
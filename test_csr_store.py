@@ -0,0 +1,74 @@
+import tempfile
+
+import pandas as pd
+import pytest
+
+from csr_store import CSRStore, write_csr
+
+# Ключи нарочно не отсортированы, строки одного ключа перемешаны с другими
+DATA = pd.DataFrame({
+    "user_id": [2, 1, 2, 1, 2, 3],
+    "track_id": [20, 10, 21, 11, 22, 30],
+    "track_seq": [0.9, 0.8, 0.7, 0.6, 0.5, 0.4],
+})
+
+
+def load_store(path: str) -> CSRStore:
+    write_csr(DATA, "user_id", ["track_id", "track_seq"], path)
+    store = CSRStore()
+    store.load(path)
+    return store
+
+
+# Порядок строк внутри ключа сохраняется
+def test_order_within_key():
+    with tempfile.TemporaryDirectory() as path:
+        store = load_store(path)
+        assert store.get(2, 10)["track_id"] == [20, 21, 22]
+        assert store.get(1, 10)["track_id"] == [10, 11]
+        assert store.get(3, 10)["track_id"] == [30]
+        assert len(store) == 3
+
+
+# Срез до k строк и случай, когда строк меньше k
+def test_slice_to_k():
+    with tempfile.TemporaryDirectory() as path:
+        store = load_store(path)
+        assert store.get(2, 2) == {"track_id": [20, 21], "track_seq": [0.9, 0.7]}
+        assert store.get(2, 3)["track_id"] == [20, 21, 22]
+        assert store.get(1, 5)["track_id"] == [10, 11]
+        assert store.get(2, 0)["track_id"] == []
+
+
+# Отсутствующий ключ
+def test_missing_key():
+    with tempfile.TemporaryDirectory() as path:
+        store = load_store(path)
+        assert store.get(42, 10) is None
+
+
+# Целочисленные колонки остаются int, вещественные float без потери точности
+def test_dtypes():
+    with tempfile.TemporaryDirectory() as path:
+        store = load_store(path)
+        result = store.get(2, 10)
+        assert all(type(value) is int for value in result["track_id"])
+        assert all(type(value) is float for value in result["track_seq"])
+        assert result["track_seq"] == [0.9, 0.7, 0.5]
+
+
+# Нечисловые колонки и колонки с пропусками не сохраняются
+def test_invalid_columns():
+    with tempfile.TemporaryDirectory() as path:
+        for values in (["a", "b"], pd.array([1, None], dtype="Int64"), [0.5, None]):
+            df = pd.DataFrame({"user_id": [1, 2], "track_id": values})
+            with pytest.raises(ValueError):
+                write_csr(df, "user_id", ["track_id"], path)
+
+
+if __name__ == "__main__":
+    test_order_within_key()
+    test_slice_to_k()
+    test_missing_key()
+    test_dtypes()
+    test_invalid_columns()